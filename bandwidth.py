@@ -0,0 +1,81 @@
+# bandwidth.py
+import datetime
+import logging
+import threading
+import time
+
+# How many seconds of traffic the bucket may save up while uploads are idle
+BURST_SECONDS = 0.25
+
+
+def parse_schedule(text):
+    """
+    Parses schedule windows such as "18:00-23:00=256, 23:00-07:00=0" into a list of
+    (start minute, end minute, KiB/s) tuples. A window may wrap past midnight and 0
+    means unlimited. Malformed entries are logged and skipped.
+    """
+    windows = []
+    for entry in filter(None, (part.strip() for part in text.split(','))):
+        try:
+            span, limit = entry.split('=')
+            start, end = (datetime.datetime.strptime(t.strip(), "%H:%M") for t in span.split('-'))
+            windows.append((start.hour * 60 + start.minute, end.hour * 60 + end.minute, int(limit)))
+        except ValueError:
+            logging.warning(f"Ignoring malformed bandwidth schedule entry '{entry}'")
+    return windows
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by all upload workers that caps total upload bytes per second.
+
+    The rate is the GUI override when one is set, otherwise the schedule window
+    covering the current time, otherwise the configured default. Workers call
+    consume() for each chunk of request body they send; a worker that overdraws
+    the bucket sleeps until the debt is repaid, so the combined rate stays capped.
+    """
+    def __init__(self, default_kbps=0, schedule=()):
+        self.default_kbps = default_kbps
+        self.schedule = list(schedule)
+        self.override_kbps = None
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+
+    def set_override(self, kbps):
+        """
+        Sets a live limit in KiB/s (0 for unlimited), or None to follow the schedule again.
+        """
+        with self._lock:
+            self.override_kbps = kbps
+        logging.info(f"Upload bandwidth limit set to {'schedule' if kbps is None else f'{kbps} KiB/s'}")
+
+    def current_kbps(self):
+        """
+        Returns the limit in force right now in KiB/s, 0 meaning unlimited.
+        """
+        if self.override_kbps is not None:
+            return self.override_kbps
+        now = datetime.datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, kbps in self.schedule:
+            in_window = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if in_window:
+                return kbps
+        return self.default_kbps
+
+    def consume(self, nbytes):
+        """
+        Takes nbytes from the bucket, sleeping as long as needed to stay under the limit.
+        """
+        rate = self.current_kbps() * 1024
+        if rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._last_refill) * rate, rate * BURST_SECONDS)
+            self._last_refill = now
+            self._tokens -= nbytes
+            delay = -self._tokens / rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,49 @@
+# byte_budget.py
+import threading
+from contextlib import contextmanager
+
+class ByteBudget:
+    """
+    Caps the number of bytes upload workers may hold in memory at the same time.
+
+    Workers reserve bytes in proportion to what they are about to buffer or encode
+    and wait while the budget is exhausted. A single reservation larger than the
+    whole budget is admitted once nothing else is held, so oversized files run
+    alone instead of waiting forever.
+    """
+    def __init__(self, capacity):
+        self.capacity = max(int(capacity), 1)
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes, force=False):
+        """
+        Blocks until nbytes fit in the budget and reserves them.
+        With force=True the bytes are reserved immediately, even over budget.
+        Returns the number of bytes reserved, which must be passed to release().
+        """
+        nbytes = min(max(int(nbytes), 0), self.capacity)
+        with self._condition:
+            while not force and self.in_use and self.in_use + nbytes > self.capacity:
+                self._condition.wait()
+            self.in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        """
+        Returns previously reserved bytes to the budget and wakes waiting workers.
+        """
+        with self._condition:
+            self.in_use = max(self.in_use - nbytes, 0)
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes, force=False):
+        """
+        Context manager that holds nbytes of the budget for the duration of the block.
+        """
+        reserved = self.acquire(nbytes, force=force)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
@@ -0,0 +1,89 @@
+# concurrency_controller.py
+import logging
+import threading
+import time
+
+# Fewest completed posts a round needs before its throughput is compared
+MIN_ROUND_SAMPLES = 3
+
+class AdaptiveConcurrency:
+    """
+    Limits how many uploads post at once and tunes that limit from the responses.
+
+    The controller is AIMD with a throughput check: each round of completed posts
+    (one per slot, at least MIN_ROUND_SAMPLES) adds a slot if bytes/s kept up with
+    the best round so far and removes one if it fell off, while a 429, a 5xx or a
+    failed request halves the limit straight away.
+    """
+    def __init__(self, initial, minimum, maximum, name="uploads"):
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.name = name
+        self.active = 0
+        self._condition = threading.Condition()
+        self._best_throughput = 0.0
+        self._reset_round()
+
+    def _reset_round(self):
+        self._round_started = time.monotonic()
+        self._round_bytes = 0
+        self._round_samples = 0
+        self._round_latency = 0.0
+
+    def acquire(self):
+        """
+        Blocks until fewer than limit uploads are posting and takes a slot.
+        """
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _set_limit(self, limit, reason):
+        limit = min(max(limit, self.minimum), self.maximum)
+        if limit != self.limit:
+            logging.info(f"Concurrency for {self.name}: {self.limit} -> {limit} ({reason})")
+            self.limit = limit
+            self._condition.notify_all()
+
+    def record(self, latency, nbytes, status_code):
+        """
+        Feeds one finished request into the controller. status_code is None if it raised.
+        """
+        with self._condition:
+            if status_code is None or status_code == 429 or status_code >= 500:
+                self._set_limit(self.limit // 2, f"status {status_code}")
+                self._reset_round()
+                return
+
+            self._round_bytes += nbytes
+            self._round_samples += 1
+            self._round_latency += latency
+            if self._round_samples < max(self.limit, MIN_ROUND_SAMPLES):
+                return
+
+            elapsed = max(time.monotonic() - self._round_started, 1e-3)
+            throughput = self._round_bytes / elapsed
+            mean_latency = self._round_latency / self._round_samples
+            summary = f"{throughput / 1024:.0f} KiB/s, {mean_latency:.2f}s mean latency"
+            if throughput >= self._best_throughput * 0.95:
+                self._best_throughput = max(self._best_throughput, throughput)
+                self._set_limit(self.limit + 1, summary)
+            else:
+                # Let the best decay so one lucky round cannot pin the limit down forever
+                self._best_throughput *= 0.9
+                self._set_limit(self.limit - 1, f"{summary}, below best")
+            self._reset_round()
@@ -41,7 +41,7 @@ def create_default_config(config_file_path, config):
     # Define default configuration values
     config['Application'] = {
         'app_title': 'VRChat Photo Uploader',
-        'window_size': '630x630',
+        'window_size': '760x780',
         'icon_path': 'icon.ico',
         'background_image': 'background_image.png',
         'font_family': 'Helvetica Rounded',
@@ -49,11 +49,48 @@ def create_default_config(config_file_path, config):
     }
     config['Logging'] = {
         'log_file': 'app.log',
-        'log_level': 'INFO'
+        'log_level': 'INFO',
+        'max_log_mb': '5',
+        'backup_count': '3',
+        'upload_log_file': 'uploads.jsonl'
     }
     config['Database'] = {
         'db_name': 'webhooks.db'
     }
+    config['Uploads'] = {
+        'max_workers': '8',
+        'min_workers': '1',
+        'adaptive_concurrency': 'true',
+        'memory_budget_mb': '512',
+        'delivery_mode': 'ordered',
+        'queue_policy': 'oldest',
+        'max_upload_mb': '10',
+        'spill_to_disk_mb': '64',
+        'skip_near_duplicates': 'false',
+        'duplicate_threshold': '6'
+    }
+    config['Forum'] = {
+        'group_threads': 'true',
+        'session_gap_minutes': '30'
+    }
+    config['Bandwidth'] = {
+        'limit_kbps': '0',
+        'schedule': ''
+    }
+    config['VRCX'] = {
+        'enrich_untagged': 'true',
+        'database_path': '',
+        'write_back': 'false'
+    }
+    config['Cache'] = {
+        'cache_dir': 'cache',
+        'max_cache_mb': '1024'
+    }
+    config['ContactSheet'] = {
+        'columns': '5',
+        'tiles_per_sheet': '20',
+        'tile_width': '480'
+    }
 
     # Write the default configuration to config.ini
     with open(config_file_path, 'w') as configfile:
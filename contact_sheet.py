@@ -0,0 +1,88 @@
+# contact_sheet.py
+import logging
+import math
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Background shown around tiles that do not fill their cell
+BACKGROUND = (24, 24, 24)
+# JPEG qualities tried in turn until a sheet fits the upload limit
+QUALITY_STEPS = (85, 75, 65, 50)
+
+
+def load_tile(file_path, tile_size):
+    """
+    Decodes an image at roughly tile size, using draft mode or an integer reduce
+    so full-resolution pixels are never materialised when avoidable.
+    """
+    with Image.open(file_path) as img:
+        img.draft('RGB', tile_size)
+        factor = min(img.size[0] // tile_size[0], img.size[1] // tile_size[1])
+        if factor > 1 and img.mode in ('L', 'LA', 'RGB', 'RGBA'):
+            img = img.reduce(factor)
+        tile = img.convert('RGB')
+    tile.thumbnail(tile_size)
+    return tile
+
+
+def sheet_count(image_count, tiles_per_sheet):
+    return math.ceil(image_count / tiles_per_sheet)
+
+
+def build_contact_sheet(file_paths, columns, tile_width, max_bytes, max_workers=4,
+                        spill_threshold=64 * 1024 * 1024):
+    """
+    Tiles the images into one JPEG contact sheet no larger than max_bytes.
+    Returns an open binary file object positioned at the start; the caller closes it.
+    """
+    # VRChat screenshots are 16:9, so cells use that aspect ratio
+    tile_size = (tile_width, tile_width * 9 // 16)
+    rows = math.ceil(len(file_paths) / columns)
+    canvas = Image.new('RGB', (columns * tile_size[0], rows * tile_size[1]), BACKGROUND)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tiles = executor.map(lambda path: _safe_tile(path, tile_size), file_paths)
+        for index, tile in enumerate(tiles):
+            if tile is None:
+                continue
+            column, row = index % columns, index // columns
+            canvas.paste(tile, (
+                column * tile_size[0] + (tile_size[0] - tile.width) // 2,
+                row * tile_size[1] + (tile_size[1] - tile.height) // 2
+            ))
+
+    # Lower the quality first, then shrink the sheet, until it fits the limit
+    while True:
+        for quality in QUALITY_STEPS:
+            buffer = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+            canvas.save(buffer, 'JPEG', quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                buffer.seek(0)
+                return buffer
+            buffer.close()
+        logging.info(f"Contact sheet exceeds {max_bytes} bytes, shrinking it")
+        canvas = canvas.resize((canvas.width * 3 // 4, canvas.height * 3 // 4), Image.LANCZOS)
+
+
+def _safe_tile(file_path, tile_size):
+    try:
+        return load_tile(file_path, tile_size)
+    except Exception as e:
+        logging.warning(f"Could not add {file_path} to contact sheet: {e}")
+        return None
+
+
+def combine_metadata(metadata_list):
+    """
+    Merges (world_name, world_id, player_names) tuples from several photos into the
+    worlds in order of first appearance and the union of players.
+    """
+    worlds = {}
+    players = {}
+    for world_name, world_id, player_names in metadata_list:
+        if world_id and world_id not in worlds:
+            worlds[world_id] = world_name
+        for player in player_names or []:
+            players.setdefault(player, None)
+    return list(worlds.items()), list(players)
@@ -2,18 +2,96 @@
 import sqlite3
 import logging
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
 from tkinter import messagebox
 
+# Each migration upgrades the schema by one version; PRAGMA user_version records the
+# last one applied. Append new migrations, never edit ones that have shipped.
+SCHEMA_MIGRATIONS = [
+    # 1: webhooks table (present since the first release)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS webhooks (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL
+        )
+        """,
+    ],
+    # 2: upload history written by the upload workers
+    [
+        """
+        CREATE TABLE IF NOT EXISTS upload_history (
+            id INTEGER PRIMARY KEY,
+            webhook_url TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            status_code INTEGER,
+            success INTEGER NOT NULL,
+            uploaded_at REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_upload_history_file ON upload_history (file_path)",
+    ],
+    # 3: forum threads created per world and session, reused by later batches
+    [
+        """
+        CREATE TABLE IF NOT EXISTS forum_threads (
+            id INTEGER PRIMARY KEY,
+            webhook_url TEXT NOT NULL,
+            world_key TEXT NOT NULL,
+            thread_id TEXT NOT NULL UNIQUE,
+            thread_name TEXT,
+            first_photo_at REAL NOT NULL,
+            last_photo_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_forum_threads_world ON forum_threads (webhook_url, world_key)",
+    ],
+    # 4: upload concurrency each webhook converged to, used to start the next session
+    [
+        """
+        CREATE TABLE IF NOT EXISTS webhook_tuning (
+            webhook_url TEXT PRIMARY KEY,
+            concurrency INTEGER NOT NULL,
+            updated_at REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+    ],
+]
+
+# Upper bound on statements grouped into one write transaction
+WRITE_BATCH_SIZE = 200
+# How long the writer waits for more statements before committing a batch
+WRITE_BATCH_WINDOW = 0.05
+# Idle read connections kept open for reuse; extra ones are closed when returned
+READ_POOL_SIZE = 4
+
+
 class DatabaseManager:
     """
-    Manages database operations for webhooks.
+    Manages database operations for webhooks, upload history, forum threads and tuning.
+
+    Reads borrow a connection from a small pool, so short-lived upload threads
+    don't leave connections behind, and all writes go through a single writer
+    thread that groups queued statements into batched transactions. With WAL
+    enabled, readers never wait for the writer.
     """
     def __init__(self, db_name):
         self.db_name = self.get_database_path(db_name)
-        self.conn = None
-        self.cursor = None
+        self._idle_connections = []
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_queue = queue.Queue()
+        self._writer_thread = None
         self.connect()
         self.setup_database()
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop, name="DatabaseWriter", daemon=True
+        )
+        self._writer_thread.start()
 
     def get_database_path(self, db_name):
         """
@@ -33,65 +111,240 @@ class DatabaseManager:
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_name)
-            self.cursor = self.conn.cursor()
+            with self._pooled_connection():
+                pass
         except sqlite3.Error as e:
             logging.error(f"Database connection error: {e}")
             messagebox.showerror("Error", f"Database connection error: {e}")
             raise
 
+    def _open_connection(self):
+        """
+        Opens a new connection configured for concurrent use.
+        """
+        conn = sqlite3.connect(self.db_name, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _close_connection(self, conn):
+        with self._connections_lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    @contextmanager
+    def _pooled_connection(self):
+        """
+        Lends an idle connection for the duration of a read, opening one if none is idle.
+        """
+        with self._connections_lock:
+            conn = self._idle_connections.pop() if self._idle_connections else None
+        if conn is None:
+            conn = self._open_connection()
+        try:
+            yield conn
+        finally:
+            with self._connections_lock:
+                keep = len(self._idle_connections) < READ_POOL_SIZE and conn in self._connections
+                if keep:
+                    self._idle_connections.append(conn)
+            if not keep:
+                self._close_connection(conn)
+
     def setup_database(self):
         """
-        Sets up the database table for storing webhooks.
+        Brings the database schema up to date by applying pending migrations.
         """
         try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS webhooks (
-                    id INTEGER PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    url TEXT NOT NULL
-                )
-            """)
-            self.conn.commit()
+            with self._pooled_connection() as conn:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for target, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+                    with conn:
+                        for statement in statements:
+                            conn.execute(statement)
+                        conn.execute(f"PRAGMA user_version = {target}")
+                    logging.info(f"Database schema migrated to version {target}")
         except sqlite3.Error as e:
             logging.error(f"Error setting up database: {e}")
             messagebox.showerror("Error", f"Error setting up database: {e}")
             raise
 
-    def insert_webhook(self, name, url):
+    def _writer_loop(self):
         """
-        Inserts a webhook into the database after validation.
+        Drains the write queue, committing queued statements in batched transactions.
+        """
+        conn = self._open_connection()
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    item = self._write_queue.get(timeout=WRITE_BATCH_WINDOW)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+            if stop:
+                return
+
+    def _commit_batch(self, conn, batch):
+        """
+        Executes a batch in one transaction, retrying statements individually if it fails.
         """
         try:
-            self.cursor.execute("INSERT INTO webhooks (name, url) VALUES (?, ?)", (name, url))
-            self.conn.commit()
+            with conn:
+                results = [conn.execute(sql, params).rowcount for sql, params, _ in batch]
         except sqlite3.Error as e:
-            logging.error(f"Error inserting webhook: {e}")
-            messagebox.showerror("Error", f"Error inserting webhook: {e}")
+            logging.warning(f"Batched write of {len(batch)} statements failed, retrying individually: {e}")
+            for sql, params, future in batch:
+                try:
+                    with conn:
+                        future.set_result(conn.execute(sql, params).rowcount)
+                except sqlite3.Error as e:
+                    logging.error(f"Database write error: {e}")
+                    future.set_exception(e)
+            return
+        for (_, _, future), rowcount in zip(batch, results):
+            future.set_result(rowcount)
 
-    def delete_webhook(self, name):
+    def submit_write(self, sql, params=()):
         """
-        Deletes a webhook from the database by name.
+        Queues a write for the writer thread and returns a Future for its row count.
+        Safe to call from any thread.
+        """
+        future = Future()
+        self._write_queue.put((sql, params, future))
+        return future
+
+    def _write_and_wait(self, sql, params, action):
+        """
+        Queues a write and waits for it, reporting errors to the user. Tk thread only.
         """
         try:
-            self.cursor.execute("DELETE FROM webhooks WHERE name = ?", (name,))
-            self.conn.commit()
+            return self.submit_write(sql, params).result()
         except sqlite3.Error as e:
-            logging.error(f"Error deleting webhook: {e}")
-            messagebox.showerror("Error", f"Error deleting webhook: {e}")
+            logging.error(f"Error {action}: {e}")
+            messagebox.showerror("Error", f"Error {action}: {e}")
+
+    def insert_webhook(self, name, url):
+        """
+        Inserts a webhook into the database after validation.
+        """
+        self._write_and_wait(
+            "INSERT INTO webhooks (name, url) VALUES (?, ?)", (name, url), "inserting webhook"
+        )
+
+    def delete_webhook(self, name):
+        """
+        Deletes a webhook from the database by name.
+        """
+        self._write_and_wait(
+            "DELETE FROM webhooks WHERE name = ?", (name,), "deleting webhook"
+        )
 
     def get_all_webhooks(self):
         """
         Retrieves all webhooks from the database.
         """
         try:
-            self.cursor.execute("SELECT name, url FROM webhooks")
-            return self.cursor.fetchall()
+            with self._pooled_connection() as conn:
+                return conn.execute("SELECT name, url FROM webhooks").fetchall()
         except sqlite3.Error as e:
             logging.error(f"Error retrieving webhooks: {e}")
             messagebox.showerror("Error", f"Error retrieving webhooks: {e}")
             return []
 
+    def record_upload(self, webhook_url, file_path, status_code, success):
+        """
+        Queues an upload history record. Safe to call from upload workers.
+        """
+        self.submit_write(
+            "INSERT INTO upload_history (webhook_url, file_path, status_code, success) "
+            "VALUES (?, ?, ?, ?)",
+            (webhook_url, file_path, status_code, int(success))
+        )
+
+    def find_forum_thread(self, webhook_url, world_key, timestamp, session_gap):
+        """
+        Finds a stored forum thread whose session is within session_gap of the timestamp.
+        Returns (thread_id, first_photo_at, last_photo_at) or None.
+        """
+        try:
+            with self._pooled_connection() as conn:
+                return conn.execute(
+                    "SELECT thread_id, first_photo_at, last_photo_at FROM forum_threads "
+                    "WHERE webhook_url = ? AND world_key = ? "
+                    "AND first_photo_at - ? <= ? AND ? <= last_photo_at + ? "
+                    "ORDER BY last_photo_at DESC LIMIT 1",
+                    (webhook_url, world_key, session_gap, timestamp, timestamp, session_gap)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Error looking up forum thread: {e}")
+            return None
+
+    def save_forum_thread(self, webhook_url, world_key, thread_id, thread_name, first_photo_at, last_photo_at):
+        """
+        Queues a record of a newly created forum thread. Safe to call from upload workers.
+        """
+        self.submit_write(
+            "INSERT OR IGNORE INTO forum_threads "
+            "(webhook_url, world_key, thread_id, thread_name, first_photo_at, last_photo_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (webhook_url, world_key, thread_id, thread_name, first_photo_at, last_photo_at)
+        )
+
+    def extend_forum_thread(self, thread_id, first_photo_at, last_photo_at):
+        """
+        Queues a widening of a forum thread's session span. Safe to call from upload workers.
+        """
+        self.submit_write(
+            "UPDATE forum_threads SET first_photo_at = MIN(first_photo_at, ?), "
+            "last_photo_at = MAX(last_photo_at, ?) WHERE thread_id = ?",
+            (first_photo_at, last_photo_at, thread_id)
+        )
+
+    def get_tuned_concurrency(self, webhook_url):
+        """
+        Returns the upload concurrency a webhook converged to last session, or None.
+        """
+        try:
+            with self._pooled_connection() as conn:
+                row = conn.execute(
+                    "SELECT concurrency FROM webhook_tuning WHERE webhook_url = ?", (webhook_url,)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logging.error(f"Error reading webhook tuning: {e}")
+            return None
+
+    def save_tuned_concurrency(self, webhook_url, concurrency):
+        """
+        Queues the converged upload concurrency for a webhook. Safe to call from upload workers.
+        """
+        self.submit_write(
+            "INSERT INTO webhook_tuning (webhook_url, concurrency) VALUES (?, ?) "
+            "ON CONFLICT(webhook_url) DO UPDATE SET concurrency = excluded.concurrency, "
+            "updated_at = strftime('%s', 'now')",
+            (webhook_url, concurrency)
+        )
+
     def close(self):
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        """
+        Flushes pending writes and closes every connection.
+        """
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._write_queue.put(None)
+            self._writer_thread.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._idle_connections.clear()
@@ -0,0 +1,133 @@
+# duplicate_filter.py
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageFilter, ImageStat
+
+# dHash compares each pixel with its right neighbour on a (HASH_SIZE + 1) x HASH_SIZE grid
+HASH_SIZE = 8
+# Long edge of the grayscale preview used for hashing and the sharpness measure
+PREVIEW_SIZE = 256
+
+# Laplacian kernel; the variance of its response is a cheap sharpness score
+LAPLACIAN = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
+
+
+def _load_preview(img):
+    """
+    Returns a small grayscale version of the image, decoding as little as possible.
+    """
+    # JPEG can decode straight to a reduced size; other formats are reduced by an integer factor
+    img.draft('L', (PREVIEW_SIZE, PREVIEW_SIZE))
+    factor = min(img.size) // PREVIEW_SIZE
+    if factor > 1 and img.mode in ('L', 'LA', 'RGB', 'RGBA'):
+        img = img.reduce(factor)
+    img = img.convert('L')
+    img.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+    return img
+
+
+def image_signature(file_path):
+    """
+    Computes the dHash of an image along with the values used to choose between duplicates.
+    Returns (hash, (sharpness, pixel count, file size)).
+    """
+    with Image.open(file_path) as img:
+        pixels = img.size[0] * img.size[1]
+        preview = _load_preview(img)
+
+    grid = preview.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    values = list(grid.getdata())
+    digest = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = values[row * (HASH_SIZE + 1) + col]
+            right = values[row * (HASH_SIZE + 1) + col + 1]
+            digest = (digest << 1) | (right > left)
+
+    sharpness = ImageStat.Stat(preview.filter(LAPLACIAN)).var[0]
+    return digest, (sharpness, pixels, os.path.getsize(file_path))
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes for finding all entries within a Hamming radius.
+    """
+    def __init__(self):
+        self.root = None
+
+    def add(self, key, value):
+        node = (key, value, {})
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming_distance(key, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, key, radius):
+        """
+        Returns the values of all entries within radius of key, nearest first.
+        """
+        if self.root is None:
+            return []
+        matches = []
+        pending = [self.root]
+        while pending:
+            node_key, value, children = pending.pop()
+            distance = hamming_distance(key, node_key)
+            if distance <= radius:
+                matches.append((distance, value))
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    pending.append(child)
+        return [value for _, value in sorted(matches, key=lambda match: match[0])]
+
+
+def find_near_duplicates(file_paths, threshold=6, max_workers=4):
+    """
+    Groups perceptually near-identical images and keeps the sharpest (then largest) of each.
+    Returns (kept paths in their original order, list of (skipped path, kept path)).
+    Images that cannot be hashed are always kept.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        signatures = list(executor.map(_safe_signature, file_paths))
+
+    tree = BKTree()
+    clusters = []
+    for path, signature in zip(file_paths, signatures):
+        if signature is None:
+            clusters.append([(path, None)])
+            continue
+        digest, quality = signature
+        matches = tree.search(digest, threshold)
+        if matches:
+            clusters[matches[0]].append((path, quality))
+        else:
+            tree.add(digest, len(clusters))
+            clusters.append([(path, quality)])
+
+    kept = set()
+    skipped = []
+    for members in clusters:
+        best = max(members, key=lambda member: member[1] or (0, 0, 0))[0]
+        kept.add(best)
+        skipped.extend((path, best) for path, _ in members if path != best)
+    return [path for path in file_paths if path in kept], skipped
+
+
+def _safe_signature(file_path):
+    try:
+        return image_signature(file_path)
+    except Exception as e:
+        logging.warning(f"Could not hash {file_path}, keeping it: {e}")
+        return None
@@ -0,0 +1,92 @@
+# forum_threads.py
+import datetime
+import threading
+import time
+
+class ForumSession:
+    """
+    A run of photos from one world, each within the session gap of the next,
+    that share a single forum thread.
+    """
+    def __init__(self, world_key, world_name, first_photo_at, last_photo_at, thread_id=None):
+        self.world_key = world_key
+        self.world_name = world_name
+        self.first_photo_at = first_photo_at
+        self.last_photo_at = last_photo_at
+        self.thread_id = thread_id
+        # Held while the thread is being created so later photos wait for its id
+        self.lock = threading.Lock()
+
+    def contains(self, timestamp, session_gap):
+        return self.first_photo_at - session_gap <= timestamp <= self.last_photo_at + session_gap
+
+    def title(self):
+        """
+        Builds the forum thread title from the world name and session start.
+        """
+        started = datetime.datetime.fromtimestamp(self.first_photo_at).strftime("%Y-%m-%d %H:%M")
+        title = f"{self.world_name or 'Image Upload'} - {started}"
+        if len(title) > 100:
+            title = title[:97] + "..."
+        return title
+
+
+class ForumThreadRegistry:
+    """
+    Assigns photos posted to a forum webhook to one thread per world and session.
+
+    Sessions are looked up in the database first, so a later batch from the same
+    session appends to the thread an earlier batch created.
+    """
+    def __init__(self, database_manager, webhook_url, session_gap):
+        self.database_manager = database_manager
+        self.webhook_url = webhook_url
+        self.session_gap = session_gap
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, world_id, world_name, timestamp):
+        """
+        Returns the session a photo belongs to, starting a new one if none is close enough.
+        """
+        world_key = world_id or ''
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for session in self._sessions.setdefault(world_key, []):
+                if session.contains(timestamp, self.session_gap):
+                    session.first_photo_at = min(session.first_photo_at, timestamp)
+                    session.last_photo_at = max(session.last_photo_at, timestamp)
+                    return session
+
+            stored = self.database_manager.find_forum_thread(
+                self.webhook_url, world_key, timestamp, self.session_gap
+            )
+            if stored:
+                thread_id, first_photo_at, last_photo_at = stored
+                session = ForumSession(
+                    world_key, world_name, min(first_photo_at, timestamp),
+                    max(last_photo_at, timestamp), thread_id
+                )
+            else:
+                session = ForumSession(world_key, world_name, timestamp, timestamp)
+            self._sessions[world_key].append(session)
+            return session
+
+    def thread_created(self, session, thread_id, thread_name):
+        """
+        Records the thread created by the first photo of a session.
+        """
+        session.thread_id = thread_id
+        self.database_manager.save_forum_thread(
+            self.webhook_url, session.world_key, thread_id, thread_name,
+            session.first_photo_at, session.last_photo_at
+        )
+
+    def photo_posted(self, session):
+        """
+        Extends the stored time span of a session's thread after a photo is posted into it.
+        """
+        self.database_manager.extend_forum_thread(
+            session.thread_id, session.first_photo_at, session.last_photo_at
+        )
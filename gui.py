@@ -1,4 +1,3 @@
-from PIL import Image, ImageTk
 import os
 import logging
 import re
@@ -8,9 +7,17 @@ from tkinter import (
     IntVar, Checkbutton, Frame, TclError
 )
 from database_manager import DatabaseManager
-from uploader import ImageUploader
+from byte_budget import ByteBudget
+from variant_cache import VariantCache
+from selection_model import FileSelection
+from virtual_list import VirtualListView
+from bandwidth import BandwidthLimiter, parse_schedule
+from vrcx_enrichment import VRCXEnricher, default_vrcx_database_path
+from upload_queue import POLICIES
 from config_loader import load_config
-from metadata_editor import PNGMetadataEditor
+
+# Pillow, requests, the uploader and the metadata editor are imported on first use
+# so the main window can appear before those modules have finished loading.
 
 class AppState:
     """
@@ -30,12 +37,38 @@ class AppState:
         self.add_webhook_window = None
         self.font_style = None
         self.background_image = None
-        self.file_path_textbox = None
+        self.selection = FileSelection()
+        self.file_list = None
+        self.selection_count_label = None
+        self.folder_pattern_entry = None
         self.media_channel_var = IntVar(master=self.root)
+        self.forum_group_var = IntVar(master=self.root)
+        self.skip_duplicates_var = IntVar(master=self.root)
+        self.contact_sheet_var = IntVar(master=self.root)
+        self.sheet_columns = 5
+        self.sheet_tiles = 20
+        self.sheet_tile_width = 480
+        self.duplicate_threshold = 6
+        self.forum_session_gap = 30 * 60
         self.database_manager = None
         self.webhooks = []
         self.upload_button = None
         self.original_bg_image = None  # Store the original background image
+        self.max_workers = 8
+        self.min_workers = 1
+        self.adaptive_concurrency = True
+        self.byte_budget = None
+        self.variant_cache = None
+        self.bandwidth = BandwidthLimiter()
+        self.bandwidth_entry = None
+        self.vrcx_enricher = None
+        self.vrcx_write_back = False
+        self.delivery_mode = 'ordered'
+        self.queue_policy = 'oldest'
+        self.queue_policy_combobox = None
+        self.active_uploader = None  # Uploader of the running session, if any
+        self.max_upload_bytes = 10 * 1024 * 1024
+        self.spill_threshold = 64 * 1024 * 1024
 
     def initialize(self):
         """
@@ -46,6 +79,57 @@ class AppState:
             self.config.getint('Application', 'font_size')
         )
         self.database_manager = DatabaseManager(self.config.get('Database', 'db_name'))
+        self.max_workers = max(self.config.getint('Uploads', 'max_workers', fallback=8), 1)
+        self.min_workers = min(
+            max(self.config.getint('Uploads', 'min_workers', fallback=1), 1), self.max_workers
+        )
+        self.adaptive_concurrency = self.config.getboolean(
+            'Uploads', 'adaptive_concurrency', fallback=True
+        )
+        self.byte_budget = ByteBudget(
+            self.config.getint('Uploads', 'memory_budget_mb', fallback=512) * 1024 * 1024
+        )
+        self.delivery_mode = self.config.get('Uploads', 'delivery_mode', fallback='ordered').lower()
+        if self.delivery_mode not in ('ordered', 'throughput'):
+            logging.warning(f"Unknown delivery_mode '{self.delivery_mode}', using 'ordered'")
+            self.delivery_mode = 'ordered'
+        self.queue_policy = self.config.get('Uploads', 'queue_policy', fallback='oldest').lower()
+        if self.queue_policy not in POLICIES:
+            logging.warning(f"Unknown queue_policy '{self.queue_policy}', using 'oldest'")
+            self.queue_policy = 'oldest'
+        self.max_upload_bytes = int(
+            self.config.getfloat('Uploads', 'max_upload_mb', fallback=10) * 1024 * 1024
+        )
+        self.spill_threshold = int(
+            self.config.getfloat('Uploads', 'spill_to_disk_mb', fallback=64) * 1024 * 1024
+        )
+        self.bandwidth = BandwidthLimiter(
+            self.config.getint('Bandwidth', 'limit_kbps', fallback=0),
+            parse_schedule(self.config.get('Bandwidth', 'schedule', fallback=''))
+        )
+        if self.config.getboolean('VRCX', 'enrich_untagged', fallback=True):
+            enricher = VRCXEnricher(
+                self.config.get('VRCX', 'database_path', fallback='') or default_vrcx_database_path()
+            )
+            if enricher.available():
+                self.vrcx_enricher = enricher
+            else:
+                logging.info(f"VRCX database not found at {enricher.database_path}; enrichment disabled")
+        self.vrcx_write_back = self.config.getboolean('VRCX', 'write_back', fallback=False)
+        max_cache_mb = self.config.getint('Cache', 'max_cache_mb', fallback=1024)
+        if max_cache_mb > 0:
+            self.variant_cache = VariantCache(
+                self.config.get('Cache', 'cache_dir', fallback='cache'), max_cache_mb * 1024 * 1024
+            )
+        self.forum_group_var.set(self.config.getboolean('Forum', 'group_threads', fallback=True))
+        self.skip_duplicates_var.set(
+            self.config.getboolean('Uploads', 'skip_near_duplicates', fallback=False)
+        )
+        self.duplicate_threshold = self.config.getint('Uploads', 'duplicate_threshold', fallback=6)
+        self.sheet_columns = max(self.config.getint('ContactSheet', 'columns', fallback=5), 1)
+        self.sheet_tiles = max(self.config.getint('ContactSheet', 'tiles_per_sheet', fallback=20), 1)
+        self.sheet_tile_width = max(self.config.getint('ContactSheet', 'tile_width', fallback=480), 16)
+        self.forum_session_gap = self.config.getfloat('Forum', 'session_gap_minutes', fallback=30) * 60
 
 
 class ApplicationGUI:
@@ -70,27 +154,15 @@ class ApplicationGUI:
         if os.path.exists(icon_path):
             self.root.iconbitmap(icon_path)
 
-        # Load and set up the background image
-        background_image_file = self.config.get('Application', 'background_image')
-        try:
-            # Load the original image using PIL
-            self.app_state.original_bg_image = Image.open(background_image_file)
-            # Resize the image to the current window size
-            resized_image = self.app_state.original_bg_image.resize(
-                (self.root.winfo_width(), self.root.winfo_height()), Image.LANCZOS
-            )
-            self.app_state.background_image = ImageTk.PhotoImage(resized_image)
-            # Create the background label
-            self.background_label = Label(self.root, image=self.app_state.background_image)
-            self.background_label.place(x=0, y=0, relwidth=1, relheight=1)
-            # Bind the resize event to the resize_background method
-            self.root.bind('<Configure>', self.resize_background)
-        except Exception as e:
-            self.app_state.background_image = None
-            logging.warning(
-                f"Background image '{background_image_file}' not found or could not be loaded. "
-                f"Running without background image. Error: {e}"
-            )
+        # Decode the background image off the Tk thread; it is placed once ready
+        self.background_label = None
+        self._background_result = None
+        self._resize_job = None
+        self._resize_generation = 0
+        self._resized_background = None
+        self._selection_version = None
+        self.app_state.selection.on_added = self.queue_added_files
+        self.load_background_async(self.config.get('Application', 'background_image'))
 
         button_style = ttk.Style()
         button_style.configure("Custom.TButton", font=self.app_state.font_style, padding=5)
@@ -99,23 +171,125 @@ class ApplicationGUI:
         self.setup_widgets()
         self.update_webhook_combobox()
 
+    def load_background_async(self, background_image_file):
+        """
+        Loads and sizes the background image on a worker thread and polls for the result.
+        """
+        # Tk is only queried here, on the Tk thread; the window has no size yet, so the
+        # first resize targets the configured one
+        screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        match = re.match(r'(\d+)x(\d+)', self.config.get('Application', 'window_size'))
+        window_size = (int(match.group(1)), int(match.group(2))) if match else screen_size
+
+        def worker():
+            try:
+                from PIL import Image
+                with Image.open(background_image_file) as image:
+                    image.load()
+                    # Later resizes start from a copy no larger than the screen
+                    source = image.resize(
+                        (min(image.width, screen_size[0]), min(image.height, screen_size[1])),
+                        Image.LANCZOS
+                    )
+                self._background_result = (source, source.resize(window_size, Image.LANCZOS))
+            except Exception as e:
+                self._background_result = e
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(50, self._poll_background)
+
+    def _poll_background(self):
+        """
+        Places the background image once the worker thread has decoded it.
+        """
+        result = self._background_result
+        if result is None:
+            self.root.after(50, self._poll_background)
+            return
+
+        if isinstance(result, Exception):
+            self.app_state.background_image = None
+            logging.warning(
+                f"Background image '{self.config.get('Application', 'background_image')}' not found "
+                f"or could not be loaded. Running without background image. Error: {result}"
+            )
+            return
+
+        self.app_state.original_bg_image, resized_image = result
+        # Create the background label behind the already placed widgets
+        self.background_label = Label(self.root)
+        self.background_label.place(x=0, y=0, relwidth=1, relheight=1)
+        self.background_label.lower()
+        self.show_background(resized_image)
+        # Bind the resize event to the resize_background method
+        self.root.bind('<Configure>', self.resize_background)
+
+    def apply_background_size(self, width, height):
+        """
+        Resizes the background image to the given size on a worker thread; the result
+        is displayed unless a newer resize has started in the meantime.
+        """
+        self._resize_job = None
+        self._resize_generation += 1
+        generation = self._resize_generation
+        source = self.app_state.original_bg_image
+
+        def worker():
+            try:
+                from PIL import Image
+                resized_image = source.resize((max(width, 1), max(height, 1)), Image.LANCZOS)
+            except Exception as e:
+                logging.warning(f"Could not resize background image: {e}")
+                resized_image = None
+            self._resized_background = (generation, resized_image)
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(20, self._poll_resized_background, generation)
+
+    def _poll_resized_background(self, generation):
+        """
+        Displays the resized background once the worker thread has produced it.
+        """
+        if generation != self._resize_generation:
+            return  # Superseded by a later resize, which polls for its own result
+        result = self._resized_background
+        if result is None or result[0] != generation:
+            self.root.after(20, self._poll_resized_background, generation)
+            return
+        if result[1] is not None:
+            self.show_background(result[1])
+
+    def show_background(self, resized_image):
+        """
+        Displays an already resized background image. Tk thread only.
+        """
+        from PIL import ImageTk
+
+        self.app_state.background_image = ImageTk.PhotoImage(resized_image)
+        # Update the background label with the new image
+        self.background_label.config(image=self.app_state.background_image)
+        # Keep a reference to prevent garbage collection
+        self.background_label.image = self.app_state.background_image
+
     def resize_background(self, event):
         """
         Resizes the background image to match the new window size.
         """
         # Check if the event is for the root window
         if event.widget == self.root:
-            new_width = event.width
-            new_height = event.height
-            # Resize the original image to the new size
-            resized_image = self.app_state.original_bg_image.resize(
-                (new_width, new_height), Image.LANCZOS
+            # Debounce so a window drag starts one LANCZOS resize, not one per event
+            if self._resize_job is not None:
+                self.root.after_cancel(self._resize_job)
+            self._resize_job = self.root.after(
+                100, self.apply_background_size, event.width, event.height
             )
-            self.app_state.background_image = ImageTk.PhotoImage(resized_image)
-            # Update the background label with the new image
-            self.background_label.config(image=self.app_state.background_image)
-            # Keep a reference to prevent garbage collection
-            self.background_label.image = self.app_state.background_image
+
+    def open_metadata_editor(self):
+        """
+        Opens the PNG metadata editor, importing it on first use.
+        """
+        from metadata_editor import PNGMetadataEditor
+        PNGMetadataEditor(Toplevel(self.root))
 
     def setup_widgets(self):
         """
@@ -147,7 +321,7 @@ class ApplicationGUI:
         Button(meta_media_frame,
                text="Edit Metadata",
                font=self.app_state.font_style,
-               command=lambda: PNGMetadataEditor(Toplevel(self.root))
+               command=self.open_metadata_editor
         ).pack(side="left", padx=(0, 10))
 
         Checkbutton(meta_media_frame,
@@ -156,17 +330,82 @@ class ApplicationGUI:
                     font=self.app_state.font_style
         ).pack(side="left")
 
+        Checkbutton(meta_media_frame,
+                    text="Group by World",
+                    variable=self.app_state.forum_group_var,
+                    font=self.app_state.font_style
+        ).pack(side="left")
 
-        file_path_label = Label(self.root, text="File Paths:", font=self.app_state.font_style)
-        self.app_state.file_path_textbox = Entry(self.root, width=50, font=self.app_state.font_style)
-        file_path_label.pack(side="top", padx=5, pady=5)
-        self.app_state.file_path_textbox.pack(side="top", padx=5, pady=5, fill='x')
+        Checkbutton(meta_media_frame,
+                    text="Skip Near-Duplicates",
+                    variable=self.app_state.skip_duplicates_var,
+                    font=self.app_state.font_style
+        ).pack(side="left")
+
+        Checkbutton(meta_media_frame,
+                    text="Contact Sheet",
+                    variable=self.app_state.contact_sheet_var,
+                    font=self.app_state.font_style
+        ).pack(side="left")
 
-        browse_button = Button(
-            self.root, text="Browse", command=self.browse_files, font=self.app_state.font_style
+
+        file_path_label = Label(self.root, text="Selected Files:", font=self.app_state.font_style)
+        file_path_label.pack(side="top", padx=5, pady=5)
+        self.app_state.file_list = VirtualListView(
+            self.root, self.app_state.selection, rows=8, font=self.app_state.font_style
+        )
+        self.app_state.file_list.pack(side="top", padx=5, pady=5, fill='x')
+
+        selection_frame = Frame(self.root)
+        selection_frame.pack(side="top", padx=5, pady=5)
+
+        Button(
+            selection_frame, text="Browse", command=self.browse_files, font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        Button(
+            selection_frame, text="Add Folder", command=self.browse_folder, font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        self.app_state.folder_pattern_entry = Entry(
+            selection_frame, width=12, font=self.app_state.font_style
+        )
+        self.app_state.folder_pattern_entry.insert(0, "*")
+        self.app_state.folder_pattern_entry.pack(side="left", padx=5)
+        Button(
+            selection_frame, text="Remove", command=self.remove_selected_files,
+            font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        Button(
+            selection_frame, text="Clear", command=self.clear_files, font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        Button(
+            selection_frame, text="Boost", command=self.boost_selected_files,
+            font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+
+        self.app_state.selection_count_label = Label(
+            self.root, text="0 files selected", font=self.app_state.font_style
+        )
+        self.app_state.selection_count_label.pack(side="top", padx=5)
+
+        bandwidth_frame = Frame(self.root)
+        bandwidth_frame.pack(side="top", padx=5, pady=5)
+        Label(
+            bandwidth_frame, text="Upload Limit (KiB/s, blank = schedule):", font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        self.app_state.bandwidth_entry = Entry(bandwidth_frame, width=8, font=self.app_state.font_style)
+        self.app_state.bandwidth_entry.pack(side="left", padx=5)
+        Button(
+            bandwidth_frame, text="Set", command=self.set_bandwidth_limit, font=self.app_state.font_style
+        ).pack(side="left", padx=5)
+        Label(bandwidth_frame, text="Queue Order:", font=self.app_state.font_style).pack(side="left", padx=5)
+        self.app_state.queue_policy_combobox = ttk.Combobox(
+            bandwidth_frame, values=list(POLICIES.values()), font=self.app_state.font_style,
+            state="readonly", width=14
         )
-        browse_button.pack(side="top", padx=5, pady=5)
-        
+        self.app_state.queue_policy_combobox.set(POLICIES[self.app_state.queue_policy])
+        self.app_state.queue_policy_combobox.bind("<<ComboboxSelected>>", self.set_queue_policy)
+        self.app_state.queue_policy_combobox.pack(side="left", padx=5)
+
         self.app_state.upload_button = Button(
             self.root, text="Upload Images", command=self.process_images, font=self.app_state.font_style
         )
@@ -292,11 +531,112 @@ class ApplicationGUI:
 
     def browse_files(self):
         """
-        Opens a file dialog for the user to select images.
+        Opens a file dialog for the user to add images to the selection.
         """
         file_paths = filedialog.askopenfilenames()
-        self.app_state.file_path_textbox.delete(0, 'end')
-        self.app_state.file_path_textbox.insert(0, ", ".join(file_paths))
+        if file_paths:
+            self.app_state.selection.add(file_paths)
+            self.refresh_file_list()
+
+    def browse_folder(self):
+        """
+        Adds every image in a folder and its subfolders that matches the name pattern.
+        The folder is scanned in the background and the list fills in as it goes.
+        """
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        self.app_state.selection.scan_async(folder, self.app_state.folder_pattern_entry.get().strip())
+        self._selection_version = None
+        self.root.after(100, self._poll_selection)
+
+    def _poll_selection(self):
+        """
+        Redraws the file list while folder scans are adding paths.
+        """
+        selection = self.app_state.selection
+        if selection.version != self._selection_version:
+            self.refresh_file_list()
+        if selection.active_scans:
+            self.root.after(100, self._poll_selection)
+
+    def refresh_file_list(self):
+        """
+        Redraws the visible rows of the file list and the selection count.
+        """
+        selection = self.app_state.selection
+        self._selection_version = selection.version
+        self.app_state.file_list.refresh()
+        text = f"{len(selection)} files selected"
+        if selection.active_scans:
+            text += " (scanning...)"
+        self.app_state.selection_count_label.config(text=text)
+
+    def remove_selected_files(self):
+        """
+        Removes the highlighted files from the selection.
+        """
+        indices = self.app_state.file_list.selected_indices()
+        if indices:
+            self.app_state.selection.remove_indices(indices)
+            self.app_state.file_list.clear_selection()
+            self.refresh_file_list()
+
+    def clear_files(self):
+        """
+        Removes every file from the selection.
+        """
+        self.app_state.selection.clear()
+        self.app_state.file_list.clear_selection()
+        self.refresh_file_list()
+
+    def set_queue_policy(self, event=None):
+        """
+        Applies the chosen queue order; a running session re-sorts the images it has not started.
+        """
+        label = self.app_state.queue_policy_combobox.get()
+        self.app_state.queue_policy = next(
+            (policy for policy, text in POLICIES.items() if text == label), 'oldest'
+        )
+        uploader = self.app_state.active_uploader
+        if uploader is not None:
+            uploader.set_queue_policy(self.app_state.queue_policy)
+
+    def boost_selected_files(self):
+        """
+        Moves the highlighted files to the front of the running session's upload queue.
+        """
+        uploader = self.app_state.active_uploader
+        if uploader is None:
+            messagebox.showinfo("Boost", "Boosting applies to files waiting in a running upload.")
+            return
+        indices = self.app_state.file_list.selected_indices()
+        paths = self.app_state.selection.snapshot()
+        boosted = uploader.boost([paths[i] for i in indices if i < len(paths)])
+        self.app_state.upload_status_label.config(
+            text=f"Moved {boosted} images to the front of the queue."
+        )
+
+    def queue_added_files(self, paths):
+        """
+        Adds files selected during an upload to the running session. Called from any thread.
+        """
+        uploader = self.app_state.active_uploader
+        if uploader is not None:
+            uploader.add_images([path for path in paths if os.path.isfile(path)])
+
+    def set_bandwidth_limit(self):
+        """
+        Applies the upload limit typed by the user; it takes effect on running uploads.
+        """
+        text = self.app_state.bandwidth_entry.get().strip()
+        if not text:
+            self.app_state.bandwidth.set_override(None)
+            return
+        if not text.isdigit():
+            messagebox.showerror("Error", "Upload limit must be a whole number of KiB/s.")
+            return
+        self.app_state.bandwidth.set_override(int(text))
 
     def process_images(self):
         """
@@ -315,24 +655,79 @@ class ApplicationGUI:
             messagebox.showerror("Error", "Webhook URL not found.")
             return
 
-        file_paths = self.app_state.file_path_textbox.get().split(', ')
+        # Images are validated by the upload workers; only drop files that are gone
         self.app_state.image_queue = []
-        for file_path in file_paths:
-            file_path = file_path.strip()
-            if not os.path.isfile(file_path):
-                messagebox.showerror("Error", f"File not found: {file_path}")
-                continue
-            try:
-                Image.open(file_path)
-            except Exception:
-                messagebox.showerror("Error", f"Invalid image file: {file_path}")
-                continue
-            self.app_state.image_queue.append(file_path)
+        missing = []
+        for file_path in self.app_state.selection.snapshot():
+            if os.path.isfile(file_path):
+                self.app_state.image_queue.append(file_path)
+            else:
+                missing.append(file_path)
+        if missing:
+            logging.warning(f"Skipping {len(missing)} missing files: {missing[:20]}")
+            messagebox.showerror(
+                "Error", f"{len(missing)} files not found, e.g. {missing[0]}"
+            )
 
         if not self.app_state.image_queue:
             messagebox.showinfo("No Images", "No valid images to upload.")
             return
 
+        if self.app_state.skip_duplicates_var.get():
+            self.filter_duplicates_async(webhook_url)
+        else:
+            self.start_upload_session(webhook_url)
+
+    def filter_duplicates_async(self, webhook_url):
+        """
+        Finds near-duplicate images on a worker thread, then asks which to skip.
+        """
+        from duplicate_filter import find_near_duplicates
+
+        self.app_state.upload_status_label.config(text="Checking for near-duplicates...")
+        self.app_state.upload_button.config(state='disabled')
+        result = {}
+
+        def worker():
+            try:
+                result['value'] = find_near_duplicates(
+                    self.app_state.image_queue, self.app_state.duplicate_threshold,
+                    self.app_state.max_workers
+                )
+            except Exception as e:
+                logging.error(f"Near-duplicate check failed: {e}")
+                result['value'] = (self.app_state.image_queue, [])
+
+        def poll():
+            if 'value' not in result:
+                self.root.after(100, poll)
+                return
+            kept, skipped = result['value']
+            if skipped:
+                preview = "\n".join(
+                    f"{os.path.basename(path)} (keeping {os.path.basename(best)})"
+                    for path, best in skipped[:15]
+                )
+                if len(skipped) > 15:
+                    preview += f"\n...and {len(skipped) - 15} more"
+                if messagebox.askyesno(
+                    "Near-Duplicates",
+                    f"{len(skipped)} of {len(self.app_state.image_queue)} images are near-duplicates "
+                    f"and will be skipped:\n\n{preview}\n\nSkip them?"
+                ):
+                    logging.info(f"Skipping {len(skipped)} near-duplicate images")
+                    self.app_state.image_queue = kept
+            self.start_upload_session(webhook_url)
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(100, poll)
+
+    def start_upload_session(self, webhook_url):
+        """
+        Shows the progress bar and starts uploading the images in the queue.
+        """
+        from uploader import ImageUploader
+
         if self.app_state.progress_bar:
             self.app_state.progress_bar.destroy()
 
@@ -347,7 +742,10 @@ class ApplicationGUI:
         self.app_state.upload_button.config(state='disabled')
 
         uploader = ImageUploader(webhook_url, self.app_state)
-        uploader.start_uploads(self.app_state.image_queue)
-        threading.Thread(
-            target=uploader.process_results, args=(len(self.app_state.image_queue),), daemon=True
-        ).start()
+        if self.app_state.contact_sheet_var.get():
+            uploader.start_contact_sheets(self.app_state.image_queue)
+        else:
+            uploader.start_uploads(self.app_state.image_queue)
+            # Files selected from now on join this session's queue
+            self.app_state.active_uploader = uploader
+        threading.Thread(target=uploader.process_results, daemon=True).start()
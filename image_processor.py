@@ -2,8 +2,62 @@
 import os
 import json
 import logging
+import shutil
 import tempfile
-from PIL import Image
+from PIL import Image, PngImagePlugin
+
+def verify_image(file_path):
+    """
+    Raises ValueError if the file is not an image Pillow can open. Only the header is read.
+    """
+    try:
+        with Image.open(file_path):
+            pass
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {file_path}") from e
+
+def parse_metadata(metadata):
+    """
+    Converts VRCX metadata JSON into world name, world ID, and player names.
+    """
+    world_info = metadata.get('world', {})
+    world_name = world_info.get('name', 'Unknown World')
+    world_id = world_info.get('id', 'Unknown ID')
+    players = metadata.get('players', [])
+    player_names = [player.get('displayName', 'Unknown') for player in players]
+    return world_name, world_id, player_names
+
+def write_png_metadata(file_path, metadata):
+    """
+    Embeds VRCX metadata JSON into a PNG in place, keeping its other text chunks
+    and its access, modification and (on Windows) creation times.
+    """
+    stat = os.stat(file_path)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with Image.open(file_path) as img:
+        info = PngImagePlugin.PngInfo()
+        for key, value in img.text.items():
+            if key != "Description":
+                info.add_text(key, value)
+        info.add_text("Description", json.dumps(metadata, indent=2, ensure_ascii=False))
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".png", delete=False) as temp_file:
+            pass
+        try:
+            img.save(temp_file.name, "PNG", pnginfo=info)
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+    os.replace(temp_file.name, file_path)
+    os.utime(file_path, (stat.st_atime, stat.st_mtime))
+    # The replacement is a new file, so its creation time has to be put back too;
+    # photos without a date in their name are ordered and captioned by it
+    from metadata_editor import load_set_file_creation_time
+    set_file_creation_time = load_set_file_creation_time()
+    if set_file_creation_time:
+        try:
+            set_file_creation_time(file_path, stat.st_ctime)
+        except Exception as e:
+            logging.warning(f"Could not restore creation time of {file_path}: {e}")
 
 def extract_image_metadata(file_path):
     """
@@ -15,29 +69,60 @@ def extract_image_metadata(file_path):
             if not description:
                 return None, None, None
 
-            metadata = json.loads(description)
-            world_info = metadata.get('world', {})
-            world_name = world_info.get('name', 'Unknown World')
-            world_id = world_info.get('id', 'Unknown ID')
-            players = metadata.get('players', [])
-            player_names = [player.get('displayName', 'Unknown') for player in players]
-
-            return world_name, world_id, player_names
+            return parse_metadata(json.loads(description))
     except (FileNotFoundError, json.JSONDecodeError) as e:
         logging.error(f"Error extracting metadata from {file_path}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error processing {file_path}: {e}")
     return None, None, None
 
-def compress_image(file_path, quality=85):
+def estimate_decoded_size(file_path):
     """
-    Compresses the image to a specific quality.
+    Estimates the bytes needed to hold the decoded image, reading only its header.
     """
     try:
         with Image.open(file_path) as img:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                img.save(temp_file.name, "JPEG", quality=quality)
-            return temp_file.name
+            width, height = img.size
+            return width * height * len(img.getbands())
+    except Exception as e:
+        logging.warning(f"Could not read image size of {file_path}: {e}")
+        return os.path.getsize(file_path)
+
+def compress_image(file_path, quality=85, cache=None, spill_threshold=64 * 1024 * 1024):
+    """
+    Compresses the image to a specific quality and returns the result as an open
+    binary file object positioned at the start; the caller closes it.
+
+    The JPEG is encoded into memory and only spills to a temporary file once it grows
+    past spill_threshold bytes. When a VariantCache is given, a cached variant is
+    returned directly and a fresh one is also stored for the next send.
+    """
+    try:
+        if cache is not None:
+            key = cache.key_for(file_path, {"format": "JPEG", "quality": quality})
+            cached_path = cache.get(key, ".jpg")
+            if cached_path:
+                return open(cached_path, 'rb')
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+        try:
+            with Image.open(file_path) as img:
+                # JPEG has no alpha channel or palette
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                img.save(buffer, "JPEG", quality=quality)
+            if cache is not None:
+                buffer.seek(0)
+                try:
+                    cache.put(key, ".jpg", lambda f: shutil.copyfileobj(buffer, f))
+                except Exception as e:
+                    # The cache only saves work next time; the upload goes ahead without it
+                    logging.warning(f"Could not cache compressed copy of {file_path}: {e}")
+            buffer.seek(0)
+        except Exception:
+            buffer.close()
+            raise
+        return buffer
     except Exception as e:
         logging.error(f"Error compressing image {file_path}: {e}")
         raise
@@ -0,0 +1,75 @@
+# log_setup.py
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Logger that receives one structured record per finished upload
+UPLOAD_LOGGER = 'uploads'
+
+def get_log_path(log_file):
+    """
+    Resolves a log file name to a path in a user-writable directory and ensures it exists.
+    """
+    # If the log file path is not absolute, place it in a user-writable directory
+    if not os.path.isabs(log_file):
+        # Get the user's AppData directory
+        appdata_dir = os.getenv('APPDATA')
+        log_dir = os.path.join(appdata_dir, 'VRChat Photo Uploader')
+        log_file = os.path.join(log_dir, log_file)
+    else:
+        log_dir = os.path.dirname(log_file)
+    os.makedirs(log_dir, exist_ok=True)  # Create the directory if it doesn't exist
+    return log_file
+
+
+class UploadRecordFormatter(logging.Formatter):
+    """
+    Formats upload records as one JSON object per line.
+    """
+    def format(self, record):
+        entry = {'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'), 'event': record.getMessage()}
+        entry.update(getattr(record, 'upload', {}))
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _queued(logger, handler):
+    """
+    Routes a logger through an in-memory queue to handler, which a listener thread writes.
+    Logging calls only enqueue the record, so they never wait on the file.
+    """
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_logging(config):
+    """
+    Configures queue-based, size-rotated logging for the application log and the
+    machine-readable upload log. Returns the listeners to stop on exit.
+    """
+    log_level = config.get('Logging', 'log_level', fallback='INFO').upper()
+    max_bytes = int(config.getfloat('Logging', 'max_log_mb', fallback=5) * 1024 * 1024)
+    backup_count = config.getint('Logging', 'backup_count', fallback=3)
+
+    app_handler = RotatingFileHandler(
+        get_log_path(config.get('Logging', 'log_file', fallback='app.log')),
+        maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    app_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, log_level, logging.INFO))
+
+    upload_handler = RotatingFileHandler(
+        get_log_path(config.get('Logging', 'upload_log_file', fallback='uploads.jsonl')),
+        maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    upload_handler.setFormatter(UploadRecordFormatter())
+    upload_logger = logging.getLogger(UPLOAD_LOGGER)
+    upload_logger.setLevel(logging.INFO)
+    upload_logger.propagate = False
+
+    return [_queued(root_logger, app_handler), _queued(upload_logger, upload_handler)]
@@ -3,16 +3,24 @@ import json
 import os
 import re
 import datetime
+import functools
 import logging
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 from PIL import Image, PngImagePlugin
 
-# Attempt to import pywin32 modules for Windows creation time update
-try:
-    import win32file
-    import pywintypes
-    import win32con
+@functools.lru_cache(maxsize=None)
+def load_set_file_creation_time():
+    """
+    Imports pywin32 on first use and returns a creation time setter, or None if unavailable.
+    """
+    try:
+        import win32file
+        import pywintypes
+        import win32con
+    except ImportError:
+        return None
+
     def set_file_creation_time(path, creation_time):
         """Set the creation time of a file (Windows only)."""
         wintime = pywintypes.Time(creation_time)
@@ -22,8 +30,8 @@ try:
         )
         win32file.SetFileTime(handle, wintime, None, None)
         handle.close()
-except ImportError:
-    set_file_creation_time = None
+
+    return set_file_creation_time
 
 class PNGMetadataEditor:
     def __init__(self, root):
@@ -223,6 +231,7 @@ class PNGMetadataEditor:
             img.save(out, pnginfo=info)
             if self.original_timestamps:
                 os.utime(out, self.original_timestamps)
+            set_file_creation_time = load_set_file_creation_time()
             if set_file_creation_time and self.original_creation_time:
                 set_file_creation_time(out, self.original_creation_time)
             messagebox.showinfo("Done", f"Saved: {out}")
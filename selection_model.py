@@ -0,0 +1,116 @@
+# selection_model.py
+import fnmatch
+import logging
+import os
+import threading
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Paths a folder scan collects before adding them to the selection in one go
+SCAN_BATCH_SIZE = 500
+
+class FileSelection:
+    """
+    Ordered, de-duplicated list of the files selected for upload.
+
+    Folder scans run on background threads and add paths in batches; the GUI
+    polls `version` to find out when to redraw. All methods are thread-safe.
+    If set, `on_added` is called with each batch of newly added paths, on the
+    thread that added them.
+    """
+    def __init__(self):
+        self._paths = []
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.active_scans = 0
+        self.on_added = None
+
+    def __len__(self):
+        return len(self._paths)
+
+    def slice(self, start, stop):
+        """
+        Returns the paths in [start, stop), e.g. the rows currently visible.
+        """
+        with self._lock:
+            return self._paths[start:stop]
+
+    def snapshot(self):
+        """
+        Returns a copy of all selected paths.
+        """
+        with self._lock:
+            return list(self._paths)
+
+    def add(self, paths):
+        """
+        Appends paths that are not selected yet and returns how many were added.
+        """
+        with self._lock:
+            added = []
+            for path in paths:
+                path = os.path.normpath(path)
+                if path not in self._seen:
+                    self._seen.add(path)
+                    self._paths.append(path)
+                    added.append(path)
+            if added:
+                self.version += 1
+        if added and self.on_added is not None:
+            self.on_added(added)
+        return len(added)
+
+    def remove_indices(self, indices):
+        """
+        Removes the paths at the given positions.
+        """
+        indices = set(indices)
+        with self._lock:
+            self._paths = [path for i, path in enumerate(self._paths) if i not in indices]
+            self._seen = set(self._paths)
+            self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._paths = []
+            self._seen = set()
+            self.version += 1
+
+    def scan_async(self, folder, pattern='*', recursive=True):
+        """
+        Adds image files under folder whose names match the glob pattern, walking
+        the tree with os.scandir on a background thread.
+        """
+        with self._lock:
+            self.active_scans += 1
+        threading.Thread(
+            target=self._scan, args=(folder, pattern or '*', recursive), daemon=True
+        ).start()
+
+    def _scan(self, folder, pattern, recursive):
+        batch = []
+        pending = [folder]
+        try:
+            while pending:
+                try:
+                    entries = os.scandir(pending.pop())
+                except OSError as e:
+                    logging.warning(f"Could not scan folder: {e}")
+                    continue
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending.append(entry.path)
+                        elif (entry.name.lower().endswith(IMAGE_EXTENSIONS)
+                              and fnmatch.fnmatch(entry.name, pattern)):
+                            batch.append(entry.path)
+                            if len(batch) >= SCAN_BATCH_SIZE:
+                                self.add(batch)
+                                batch = []
+            self.add(batch)
+        finally:
+            with self._lock:
+                self.active_scans -= 1
+                self.version += 1
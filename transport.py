@@ -0,0 +1,91 @@
+# transport.py
+import mimetypes
+import os
+import uuid
+
+# Size of the chunks handed to the HTTP connection while the body is sent
+CHUNK_SIZE = 64 * 1024
+
+def _quote_header_value(value):
+    """
+    Escapes a form-data parameter value the way browsers do (HTML5 rules).
+    """
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+class MultipartBody:
+    """
+    A multipart/form-data request body streamed from its parts.
+
+    The file part is read in chunks from a buffer or open file while the request is
+    sent, so the upload is never copied into one large in-memory body. Pass it to
+    requests as data= together with its content_type header; len() supplies the
+    Content-Length. An optional throttle(nbytes) callable is invoked for every chunk
+    as it is handed to the connection, which is how bandwidth limits are applied.
+    """
+    def __init__(self, fields, file_field, filename, source, throttle=None):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        head = []
+        for name, value in fields.items():
+            head.append(
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{_quote_header_value(name)}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        file_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        head.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote_header_value(file_field)}"; '
+            f'filename="{_quote_header_value(filename)}"\r\n'
+            f'Content-Type: {file_type}\r\n\r\n'
+        )
+        tail = f'\r\n--{boundary}--\r\n'
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = memoryview(source).cast('B')
+            source_length = len(source)
+        else:
+            # File objects are sent from their current position to the end
+            position = source.tell()
+            source_length = source.seek(0, os.SEEK_END) - position
+            source.seek(position)
+
+        self._parts = [
+            memoryview(''.join(head).encode('utf-8')), source, memoryview(tail.encode('utf-8'))
+        ]
+        self._length = len(self._parts[0]) + source_length + len(self._parts[2])
+        self._part_offset = 0
+        self._throttle = throttle
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        """
+        Returns up to size bytes of the body, or an empty bytes object when it is exhausted.
+        """
+        if size is None or size < 0:
+            size = self._length
+        while self._parts:
+            part = self._parts[0]
+            if isinstance(part, memoryview):
+                chunk = part[self._part_offset:self._part_offset + size]
+                self._part_offset += len(chunk)
+            else:
+                chunk = part.read(size)
+            if chunk:
+                if self._throttle is not None:
+                    self._throttle(len(chunk))
+                return chunk
+            self._parts.pop(0)
+            self._part_offset = 0
+        return b''
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,117 @@
+# upload_queue.py
+import heapq
+import itertools
+import threading
+
+# Queue order policies, keyed by config value, with the label shown in the GUI
+POLICIES = {
+    'oldest': "Oldest First",
+    'newest': "Newest First",
+    'smallest': "Smallest First",
+    'fifo': "Order Added",
+}
+
+
+class UploadQueue:
+    """
+    Thread-safe priority queue of images waiting to upload.
+
+    Images are ordered by the selected policy: order added, oldest or newest
+    timestamp first, or smallest file first. Boosted images jump ahead of
+    everything else, in the order they were boosted. Images can be added, boosted
+    and the policy changed while workers are taking from the queue.
+    """
+    def __init__(self, policy='oldest'):
+        self.policy = policy if policy in POLICIES else 'oldest'
+        self._heap = []
+        self._entries = {}  # path -> live heap entry
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._entries)
+
+    def _policy_key(self, timestamp, size):
+        if self.policy == 'oldest':
+            return float('inf') if timestamp is None else timestamp
+        if self.policy == 'newest':
+            return float('inf') if timestamp is None else -timestamp
+        if self.policy == 'smallest':
+            return size
+        return 0
+
+    def _push(self, path, timestamp, size, added, boost=None):
+        # Boosted entries sort first (rank 0) by boost order; the rest by policy, then
+        # by the order they were added, which re-pushed entries keep
+        if boost is None:
+            key = (1, self._policy_key(timestamp, size), added)
+        else:
+            key = (0, boost, added)
+        entry = [key, path, timestamp, size, added, boost, True]
+        self._entries[path] = entry
+        heapq.heappush(self._heap, entry)
+
+    def put(self, path, timestamp=None, size=0):
+        """
+        Adds an image; returns False if it is already waiting or the queue is closed.
+        """
+        with self._condition:
+            if self._closed or path in self._entries:
+                return False
+            self._push(path, timestamp, size, next(self._counter))
+            self._condition.notify()
+            return True
+
+    def boost(self, paths):
+        """
+        Moves waiting images to the front of the queue. Returns how many were boosted.
+        """
+        boosted = 0
+        with self._condition:
+            for path in paths:
+                entry = self._entries.get(path)
+                if entry is None or entry[5] is not None:
+                    continue
+                entry[6] = False  # Leave the old heap entry to be skipped when popped
+                self._push(path, entry[2], entry[3], entry[4], boost=next(self._counter))
+                boosted += 1
+        return boosted
+
+    def set_policy(self, policy):
+        """
+        Changes the order policy, re-sorting the images still waiting.
+        """
+        with self._condition:
+            self.policy = policy if policy in POLICIES else 'oldest'
+            entries = [entry for entry in self._heap if entry[6]]
+            self._heap = []
+            self._entries = {}
+            for _, path, timestamp, size, added, boost, _ in entries:
+                self._push(path, timestamp, size, added, boost)
+
+    def get(self):
+        """
+        Blocks until an image is available and returns (path, timestamp), or None once
+        the queue is closed and empty.
+        """
+        with self._condition:
+            while True:
+                while self._heap and not self._heap[0][6]:
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    _, path, timestamp, _, _, _, _ = heapq.heappop(self._heap)
+                    del self._entries[path]
+                    return path, timestamp
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def close(self):
+        """
+        Stops accepting images; workers drain what is left and then receive None.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
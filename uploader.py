@@ -1,19 +1,101 @@
+import contextlib
 import os
 import re
 import requests
 import logging
 import threading
 import queue
-from image_processor import extract_image_metadata, compress_image
+import time
+from concurrent.futures import ThreadPoolExecutor
+from image_processor import (
+    extract_image_metadata, compress_image, estimate_decoded_size, verify_image,
+    parse_metadata, write_png_metadata
+)
+from forum_threads import ForumThreadRegistry
+from transport import MultipartBody, CHUNK_SIZE
+from concurrency_controller import AdaptiveConcurrency
+from log_setup import UPLOAD_LOGGER
+from contact_sheet import build_contact_sheet, combine_metadata, sheet_count
+from upload_queue import UploadQueue
+
+# Longest part of a response body written to the log
+RESPONSE_LOG_LIMIT = 300
+# Most player names listed in a contact sheet message
+SHEET_MAX_PLAYERS = 40
+# Images taken off the queue ahead of the one being posted in ordered mode, per worker.
+# Anything further back stays queued, so boosts and policy changes still reorder it.
+READ_AHEAD_PER_WORKER = 4
+
+upload_log = logging.getLogger(UPLOAD_LOGGER)
+
+class PreparedUpload:
+    """
+    An image that has been read, captioned and, if needed, compressed ahead of posting.
+    """
+    def __init__(self, file_path, timestamp, reserved):
+        self.file_path = file_path
+        self.timestamp = timestamp
+        self.reserved = reserved  # Bytes held in the byte budget until the post finishes
+        self.payload = {}
+        self.metadata = (None, None, None)
+        self.filename = os.path.basename(file_path)
+        self.buffer = None  # Encoded variant; the original file is streamed when None
+        self.compressed = False
+        self.error = None
+        self.sent_bytes = 0
+
 
 class ImageUploader:
     """
     Manages image uploads to Discord via webhooks.
+
+    Images wait in an UploadQueue ordered by the selected policy, and more can be
+    added with add_images while the session runs. In "ordered" delivery mode images
+    are prepared in parallel but posted one at a time in queue order through a
+    reorder buffer. In "throughput" mode every worker prepares and posts its own
+    images as fast as it can, and the number of concurrent posts can be tuned per
+    webhook by an AdaptiveConcurrency controller.
+
+    When posting to a forum channel with grouping enabled, the first photo of each
+    world and session creates a thread and later photos are posted into it.
     """
     def __init__(self, webhook_url, app_state):
         self.webhook_url = webhook_url
+        # The id identifies the webhook in logs without exposing its token
+        self.webhook_id = webhook_url.rstrip('/').rsplit('/', 2)[-2]
         self.app_state = app_state
         self.result_queue = queue.Queue()
+        self.byte_budget = app_state.byte_budget
+        self.variant_cache = app_state.variant_cache
+        self.ordered = app_state.delivery_mode == 'ordered'
+        self.concurrency = None
+        if not self.ordered and app_state.adaptive_concurrency:
+            # Start from what this webhook converged to last session
+            initial = app_state.database_manager.get_tuned_concurrency(webhook_url)
+            self.concurrency = AdaptiveConcurrency(
+                initial or app_state.min_workers, app_state.min_workers, app_state.max_workers,
+                name=self.webhook_id
+            )
+            logging.info(f"Starting uploads with concurrency {self.concurrency.limit}")
+        # Read the Tk variables here; workers must not touch Tk
+        self.forum_channel = bool(app_state.media_channel_var.get())
+        self.forum_threads = None
+        if self.forum_channel and app_state.forum_group_var.get():
+            self.forum_threads = ForumThreadRegistry(
+                app_state.database_manager, webhook_url, app_state.forum_session_gap
+            )
+        self.upload_queue = UploadQueue(app_state.queue_policy)
+        # Images expected in this session; grows as images are added while it runs
+        self.total = 0
+        self._accepting = False
+        self._session_lock = threading.Lock()
+        self._read_ahead = threading.Semaphore(app_state.max_workers * READ_AHEAD_PER_WORKER)
+        self._reorder_buffer = {}
+        # Photos not yet looked up in the VRCX game log, resolved together on first need
+        self._enrich_pending = {}
+        self._enriched = {}
+        self._enrich_lock = threading.Lock()
+        self._reorder_condition = threading.Condition()
 
     def _get_timestamp(self, file_path):
         """
@@ -42,14 +124,73 @@ class ImageUploader:
             logging.warning(f"Could not get creation time for {file_path}: {e}")
             return None
 
-    def create_payload(self, file_path, timestamp):
+    def _queue_enrichment(self, entries):
+        """
+        Registers (timestamp, path) pairs for the next VRCX game-log lookup.
+        """
+        if self.app_state.vrcx_enricher is not None:
+            with self._enrich_lock:
+                self._enrich_pending.update((path, timestamp) for timestamp, path in entries)
+
+    def _image_metadata(self, file_path, timestamp):
+        """
+        Returns the embedded metadata, falling back to the VRCX game log for untagged photos.
+        All photos registered so far are resolved in one pass the first time one is needed.
+        """
+        metadata = extract_image_metadata(file_path)
+        enricher = self.app_state.vrcx_enricher
+        if metadata[0] is not None or enricher is None:
+            return metadata
+
+        with self._enrich_lock:
+            if file_path not in self._enriched:
+                self._enrich_pending[file_path] = timestamp
+                try:
+                    self._enriched.update(dict.fromkeys(self._enrich_pending))
+                    self._enriched.update(enricher.lookup(self._enrich_pending))
+                except Exception as e:
+                    logging.error(f"Error reading the VRCX database: {e}")
+                self._enrich_pending = {}
+            enriched = self._enriched.get(file_path)
+        if enriched is None:
+            return metadata
+
+        if self._writes_back(file_path):
+            try:
+                write_png_metadata(file_path, enriched)
+            except Exception as e:
+                logging.warning(f"Could not write metadata into {file_path}: {e}")
+        return parse_metadata(enriched)
+
+    def _writes_back(self, file_path):
+        """
+        Whether game-log metadata found for this image is written back into the file.
+        """
+        return (
+            self.app_state.vrcx_enricher is not None and self.app_state.vrcx_write_back
+            and file_path.lower().endswith('.png')
+        )
+
+    def _sorted_by_timestamp(self, file_paths):
+        """
+        Returns (timestamp, path) pairs in timestamp order.
+        Images without a timestamp come last, in selection order.
+        """
+        return sorted(
+            ((self._get_timestamp(path), path) for path in file_paths),
+            key=lambda entry: (entry[0] is None, entry[0] or 0)
+        )
+
+    def create_payload(self, file_path, timestamp, metadata=None):
         """
         Creates the payload message for the webhook.
         """
-        world_name, world_id, player_names = extract_image_metadata(file_path)
+        if metadata is None:
+            metadata = extract_image_metadata(file_path)
+        world_name, world_id, player_names = metadata
         if not all([world_name, world_id, player_names]):
             # If metadata is missing or incomplete
-            if self.app_state.media_channel_var.get():
+            if self.forum_channel:
                 thread_title = "Image Upload"
                 return {"thread_name": thread_title}
             return {}
@@ -68,59 +209,405 @@ class ImageUploader:
             title = title[:97] + "..."
 
         payload = {"content": content}
-        if self.app_state.media_channel_var.get():
+        if self.forum_channel:
             payload["thread_name"] = title
         return payload
 
-    def upload_image(self, file_path):
+    def create_sheet_payload(self, photo_count, metadata_list, timestamps):
         """
-        Uploads the image to the specified webhook URL.
+        Creates the payload message for a contact sheet from the metadata of its photos.
+        """
+        worlds, players = combine_metadata(metadata_list)
+        if not worlds:
+            return {"thread_name": "Image Upload"} if self.forum_channel else {}
+
+        world_text = ", ".join(
+            f"**{world_name}** (*[**VRChat**](<https://vrchat.com/home/launch?worldId={world_id}>)*)"
+            for world_id, world_name in worlds
+        )
+        content = f"{photo_count} photos taken at {world_text}"
+        if players:
+            shown = players[:SHEET_MAX_PLAYERS]
+            content += f" with **{', '.join(shown)}**"
+            if len(players) > len(shown):
+                content += f" and {len(players) - len(shown)} others"
+        if timestamps:
+            content += f" between <t:{int(min(timestamps))}:f> and <t:{int(max(timestamps))}:f>"
+        if len(content) > 2000:
+            content = content[:1997] + "..."
+
+        title = f"Photos taken at {worlds[0][1]}"
+        if len(worlds) > 1:
+            title += f" and {len(worlds) - 1} more"
+        if len(title) > 100:
+            title = title[:97] + "..."
+
+        payload = {"content": content}
+        if self.forum_channel:
+            payload["thread_name"] = title
+        return payload
+
+    def _estimate_memory(self, file_path):
+        """
+        Estimates the bytes an upload holds in memory while it is prepared and posted.
         """
         try:
-            timestamp = self._get_timestamp(file_path)
-            payload = self.create_payload(file_path, timestamp) or {}
+            size = os.path.getsize(file_path)
+        except OSError:
+            return 0
+        # Originals are streamed from disk one chunk at a time
+        if size <= self.app_state.max_upload_bytes:
+            estimate = CHUNK_SIZE
+        else:
+            estimate = self._estimate_compression_memory(file_path, size)
+        if self._writes_back(file_path):
+            # Writing metadata back decodes and re-encodes the image before it is sent.
+            # Whether it will be needed is only known once the file is read, so it is
+            # reserved up front rather than while the upload already holds budget.
+            estimate = max(estimate, estimate_decoded_size(file_path) + CHUNK_SIZE)
+        return estimate
 
-            with open(file_path, 'rb') as f:
-                data = f.read()
+    def _estimate_compression_memory(self, file_path, size):
+        """
+        Estimates the bytes held while an image is decoded and its JPEG kept in memory.
+        """
+        return estimate_decoded_size(file_path) + min(size, self.app_state.spill_threshold)
+
+    def _compress(self, item):
+        """
+        Replaces the upload source with a compressed JPEG version of the image.
+        """
+        item.buffer = compress_image(
+            item.file_path, cache=self.variant_cache,
+            spill_threshold=self.app_state.spill_threshold
+        )
+        item.filename = os.path.splitext(os.path.basename(item.file_path))[0] + ".jpg"
+        item.compressed = True
+
+    def prepare_upload(self, item):
+        """
+        Reads the image, builds its payload and compresses it if it exceeds the upload limit.
+        Errors are stored on the item and reported when it is posted.
+        """
+        try:
+            verify_image(item.file_path)
+            item.metadata = self._image_metadata(item.file_path, item.timestamp)
+            item.payload = self.create_payload(item.file_path, item.timestamp, item.metadata) or {}
+            if os.path.getsize(item.file_path) > self.app_state.max_upload_bytes:
+                self._compress(item)
+        except Exception as e:
+            item.error = e
+        return item
+
+    def post_upload(self, item):
+        """
+        Posts a prepared image to the webhook URL and reports the result.
+        """
+        file_path = item.file_path
+        started = time.monotonic()
+        status_code = None
+        try:
+            if item.error:
+                raise item.error
 
-            files = {'file': (os.path.basename(file_path), data)}
-            response = requests.post(self.webhook_url, data=payload, files=files)
+            response = self._send(item)
 
-            if response.status_code == 413:
-                # If file too large, compress and retry
-                comp_path = compress_image(file_path)
-                with open(comp_path, 'rb') as f2:
-                    data2 = f2.read()
-                files = {'file': (os.path.basename(comp_path), data2)}
-                response = requests.post(self.webhook_url, data=payload, files=files)
-                os.remove(comp_path)
+            if response.status_code == 413 and not item.compressed:
+                # If file too large, compress and retry. In ordered mode this item is the
+                # head of the line and cannot wait for budget held by items behind it.
+                # The streaming reservation is given back first; holding it would keep an
+                # oversized request from ever being admitted.
+                self.byte_budget.release(item.reserved)
+                item.reserved = 0
+                item.reserved = self.byte_budget.acquire(
+                    self._estimate_compression_memory(file_path, os.path.getsize(file_path)),
+                    force=self.ordered
+                )
+                self._compress(item)
+                response = self._send(item)
 
-            logging.info(f"Response for {os.path.basename(file_path)}: {response.status_code} - {response.text}")
-            if response.status_code == 200:
+            status_code = response.status_code
+            logging.info(f"Response for {os.path.basename(file_path)}: {status_code}")
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(
+                    f"Response body for {os.path.basename(file_path)}: {response.text[:RESPONSE_LOG_LIMIT]}"
+                )
+            self.app_state.database_manager.record_upload(
+                self.webhook_url, file_path, status_code, status_code == 200
+            )
+            if status_code == 200:
                 self.result_queue.put((True, f"Image uploaded: {file_path}"))
             else:
-                self.result_queue.put((False, f"Upload failed ({response.status_code}): {file_path}"))
+                logging.warning(
+                    f"Upload of {os.path.basename(file_path)} rejected: {response.text[:RESPONSE_LOG_LIMIT]}"
+                )
+                self.result_queue.put((False, f"Upload failed ({status_code}): {file_path}"))
         except Exception as e:
             logging.error(f"Error uploading {file_path}: {e}")
+            self.app_state.database_manager.record_upload(self.webhook_url, file_path, None, False)
             self.result_queue.put((False, str(e)))
+        finally:
+            upload_log.info('upload', extra={'upload': {
+                'file': file_path,
+                'webhook_id': self.webhook_id,
+                'status': status_code,
+                'success': status_code == 200,
+                'bytes': item.sent_bytes,
+                'compressed': item.compressed,
+                'seconds': round(time.monotonic() - started, 3),
+            }})
+            if item.buffer is not None:
+                item.buffer.close()
+                item.buffer = None
+            self.byte_budget.release(item.reserved)
+
+    def _post(self, item, payload, params=None):
+        """
+        Posts the payload and the item's image as a streamed multipart body.
+        """
+        if item.buffer is not None:
+            item.buffer.seek(0)
+            source = contextlib.nullcontext(item.buffer)
+        else:
+            source = open(item.file_path, 'rb')
+        with source as f, self.concurrency or contextlib.nullcontext():
+            body = MultipartBody(
+                payload, 'file', item.filename, f, throttle=self.app_state.bandwidth.consume
+            )
+            item.sent_bytes += len(body)
+            started = time.monotonic()
+            status_code = None
+            try:
+                response = requests.post(
+                    self.webhook_url, params=params, data=body,
+                    headers={'Content-Type': body.content_type}
+                )
+                status_code = response.status_code
+                return response
+            finally:
+                if self.concurrency is not None:
+                    self.concurrency.record(time.monotonic() - started, len(body), status_code)
+
+    def _send(self, item):
+        """
+        Posts the item, routing it into its world/session thread when grouping.
+        """
+        if self.forum_threads is None:
+            return self._post(item, item.payload)
+
+        world_name, world_id, _ = item.metadata
+        session = self.forum_threads.session_for(world_id, world_name, item.timestamp)
+        with session.lock:
+            if session.thread_id is None:
+                # The first photo creates the thread; wait=true returns the message,
+                # whose channel_id is the new thread's id
+                thread_name = session.title()
+                payload = dict(item.payload, thread_name=thread_name)
+                response = self._post(item, payload, params={'wait': 'true'})
+                if response.status_code == 200:
+                    self.forum_threads.thread_created(session, response.json()['channel_id'], thread_name)
+                return response
+
+        payload = {key: value for key, value in item.payload.items() if key != 'thread_name'}
+        response = self._post(item, payload, params={'thread_id': session.thread_id})
+        if response.ok:
+            self.forum_threads.photo_posted(session)
+        return response
+
+    def upload_image(self, file_path, timestamp=None):
+        """
+        Uploads the image to the specified webhook URL.
+        """
+        if timestamp is None:
+            timestamp = self._get_timestamp(file_path)
+        item = PreparedUpload(
+            file_path, timestamp, self.byte_budget.acquire(self._estimate_memory(file_path))
+        )
+        self.post_upload(self.prepare_upload(item))
+
+    def add_images(self, file_paths):
+        """
+        Queues images for upload, including while the session is running.
+        Returns how many were queued; none are once the session has finished.
+        """
+        with self._session_lock:
+            if not self._accepting:
+                return 0
+            entries = []
+            for path in file_paths:
+                timestamp = self._get_timestamp(path)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = 0
+                if self.upload_queue.put(path, timestamp, size):
+                    entries.append((timestamp, path))
+            self._queue_enrichment(entries)
+            self.total += len(entries)
+            return len(entries)
+
+    def boost(self, file_paths):
+        """
+        Moves queued images to the front. Images already being prepared or posted keep their place.
+        """
+        boosted = self.upload_queue.boost(file_paths)
+        if boosted:
+            logging.info(f"Boosted {boosted} images to the front of the upload queue")
+        return boosted
+
+    def set_queue_policy(self, policy):
+        """
+        Re-sorts the images still queued under a different policy.
+        """
+        self.upload_queue.set_policy(policy)
+        logging.info(f"Upload queue order changed to {self.upload_queue.policy}")
 
     def start_uploads(self, image_queue):
         """
         Starts the upload process for all images in the queue.
         """
-        for path in image_queue:
-            threading.Thread(target=self.upload_image, args=(path,), daemon=True).start()
+        self._accepting = True
+        self.add_images(image_queue)
+        if self.ordered:
+            self._start_ordered_uploads()
+            return
+
+        for _ in range(self.app_state.max_workers):
+            threading.Thread(target=self._upload_worker, daemon=True).start()
+
+    def _upload_worker(self):
+        """
+        Uploads images from the upload queue until it is closed and empty.
+        """
+        while True:
+            entry = self.upload_queue.get()
+            if entry is None:
+                return
+            path, timestamp = entry
+            self.upload_image(path, timestamp)
+
+    def start_contact_sheets(self, image_queue):
+        """
+        Composites the images into contact sheets and posts them in timestamp order.
+        Returns the number of sheets that will be posted.
+        """
+        threading.Thread(target=self._post_contact_sheets, args=(image_queue,), daemon=True).start()
+        self.total = sheet_count(len(image_queue), self.app_state.sheet_tiles)
+        return self.total
+
+    def _post_contact_sheets(self, image_queue):
+        """
+        Builds and posts each contact sheet in turn.
+        """
+        entries = self._sorted_by_timestamp(image_queue)
+        self._queue_enrichment(entries)
+        tiles_per_sheet = self.app_state.sheet_tiles
+        columns = self.app_state.sheet_columns
+        tile_width = self.app_state.sheet_tile_width
+        # The canvas is held once as pixels and once more while it is being encoded
+        canvas_bytes = tiles_per_sheet * tile_width * (tile_width * 9 // 16) * 3
+        for number, start in enumerate(range(0, len(entries), tiles_per_sheet), start=1):
+            chunk = entries[start:start + tiles_per_sheet]
+            file_paths = [path for _, path in chunk]
+            timestamps = [timestamp for timestamp, _ in chunk if timestamp]
+            item = PreparedUpload(
+                f"contact sheet {number} ({len(file_paths)} photos)",
+                min(timestamps) if timestamps else None,
+                self.byte_budget.acquire(2 * canvas_bytes)
+            )
+            try:
+                metadata_list = [self._image_metadata(path, timestamp) for timestamp, path in chunk]
+                item.payload = self.create_sheet_payload(len(file_paths), metadata_list, timestamps)
+                worlds, players = combine_metadata(metadata_list)
+                if worlds:
+                    item.metadata = (worlds[0][1], worlds[0][0], players)
+                item.buffer = build_contact_sheet(
+                    file_paths, columns, tile_width, self.app_state.max_upload_bytes,
+                    self.app_state.max_workers, self.app_state.spill_threshold
+                )
+                item.filename = f"contact_sheet_{number}.jpg"
+                # Sheets are already sized to fit, so a 413 is not retried with compression
+                item.compressed = True
+            except Exception as e:
+                item.error = e
+            self.post_upload(item)
+
+    def _start_ordered_uploads(self):
+        """
+        Prepares images in parallel and posts them strictly in queue order.
+        """
+        threading.Thread(target=self._feed_ordered, daemon=True).start()
+        threading.Thread(target=self._post_ordered, daemon=True).start()
+
+    def _feed_ordered(self):
+        """
+        Takes images off the upload queue, reserves memory for each in posting order and
+        hands it to the preparation pool. Reserving in order guarantees the next image to
+        post can always be admitted.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.app_state.max_workers)
+        seq = 0
+        while True:
+            # Wait for room before dequeuing so later images stay reorderable
+            self._read_ahead.acquire()
+            entry = self.upload_queue.get()
+            if entry is None:
+                break
+            path, timestamp = entry
+            item = PreparedUpload(path, timestamp, self.byte_budget.acquire(self._estimate_memory(path)))
+            executor.submit(self.prepare_upload, item).add_done_callback(
+                lambda future, seq=seq: self._buffer_prepared(seq, future.result())
+            )
+            seq += 1
+        executor.shutdown(wait=False)
+        # Tells the poster no image follows the last one
+        self._buffer_prepared(seq, None)
+
+    def _buffer_prepared(self, seq, item):
+        """
+        Stores a prepared image in the reorder buffer until its turn to be posted.
+        """
+        with self._reorder_condition:
+            self._reorder_buffer[seq] = item
+            self._reorder_condition.notify_all()
+
+    def _post_ordered(self):
+        """
+        Posts prepared images from the reorder buffer in sequence until the feeder finishes.
+        """
+        seq = 0
+        while True:
+            with self._reorder_condition:
+                while seq not in self._reorder_buffer:
+                    self._reorder_condition.wait()
+                item = self._reorder_buffer.pop(seq)
+            if item is None:
+                return
+            self.post_upload(item)
+            self._read_ahead.release()
+            seq += 1
+
+    def _finish_if_done(self, done):
+        """
+        Stops accepting images once every queued image has a result. Returns True if finished.
+        """
+        with self._session_lock:
+            if done < self.total:
+                return False
+            self._accepting = False
+            self.upload_queue.close()
+            return True
 
-    def process_results(self, total_images):
+    def process_results(self):
         """
-        Processes the results from the upload threads.
+        Processes the results from the upload threads until every queued image has finished.
         """
         done = 0
-        while done < total_images:
+        while not self._finish_if_done(done):
             try:
                 success, msg = self.result_queue.get(timeout=1)
                 done += 1
-                prog = (done / total_images) * 100
+                prog = (done / self.total) * 100
                 self.app_state.progress_bar['value'] = prog
                 self.app_state.root.update()
 
@@ -138,4 +625,9 @@ class ImageUploader:
             )
         else:
             self.app_state.upload_status_label.config(text="All images uploaded successfully")
-        self.app_state.upload_button.config(state='normal')
\ No newline at end of file
+        self.app_state.upload_button.config(state='normal')
+        self.app_state.active_uploader = None
+        if self.concurrency is not None:
+            self.app_state.database_manager.save_tuned_concurrency(
+                self.webhook_url, self.concurrency.limit
+            )
\ No newline at end of file
@@ -0,0 +1,110 @@
+# variant_cache.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+class VariantCache:
+    """
+    Persistent cache of prepared upload variants (compressed, resized or converted
+    images), keyed by the source content hash plus the encoder parameters.
+
+    Entries live as files under the app data directory. The total size is capped
+    and the least recently used entries are evicted first; a hit refreshes the
+    entry's modification time, which is what eviction orders by.
+    """
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = self.get_cache_path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Computed on first store
+
+    def get_cache_path(self, cache_dir):
+        """
+        Determines the full path to the cache directory in a user-writable directory.
+        """
+        if not os.path.isabs(cache_dir):
+            appdata_dir = os.getenv('APPDATA')
+            cache_dir = os.path.join(appdata_dir, 'VRChat Photo Uploader', cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    def key_for(self, source_path, params):
+        """
+        Builds the cache key from the source file's content and the encoder parameters.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key, extension):
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    def get(self, key, extension):
+        """
+        Returns the path of a cached variant, or None on a miss.
+        """
+        path = self._entry_path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, extension, write):
+        """
+        Stores a variant written by write(f), which receives the entry opened for binary writing.
+        Returns the path of the cached variant.
+        """
+        path = self._entry_path(key, extension)
+        # Write to a unique name and rename, so concurrent writers never see a partial file
+        staging_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}{extension}")
+        try:
+            with open(staging_path, 'wb') as f:
+                write(f)
+            os.replace(staging_path, path)
+        except Exception:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _entries(self):
+        """
+        Yields (path, mtime, size) for every cache entry.
+        """
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def _evict(self, keep):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._total_bytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError as e:
+                logging.warning(f"Could not evict cached variant {path}: {e}")
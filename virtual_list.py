@@ -0,0 +1,138 @@
+# virtual_list.py
+from tkinter import Frame, Listbox, Scrollbar
+
+# event.state bits of the modifiers that extend a selection instead of replacing it
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+
+class VirtualListView(Frame):
+    """
+    A list view that only creates rows for the items currently visible, so it stays
+    fast with tens of thousands of entries.
+
+    The items come from a model exposing len() and slice(start, stop); call
+    refresh() after the model changes. Selection is tracked by model index, so it
+    survives scrolling: a plain click replaces it, while Ctrl and Shift clicks add to
+    rows selected on other pages. The arrow, Page and Home/End keys move through the
+    whole model, scrolling as needed.
+    """
+    def __init__(self, master, model, rows=8, **listbox_options):
+        super().__init__(master)
+        self.model = model
+        self.rows = rows
+        self.offset = 0
+        self.selected = set()
+        self.active = None  # Model index of the keyboard cursor
+        self.anchor = None  # Model index a Shift selection extends from
+        self._extend = False
+
+        self.listbox = Listbox(
+            self, height=rows, selectmode="extended", activestyle="none",
+            exportselection=False, **listbox_options
+        )
+        self.scrollbar = Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind('<Button-1>', self._on_click)
+        self.listbox.bind('<<ListboxSelect>>', self._on_select)
+        self.listbox.bind('<Up>', lambda event: self._move_to(event, self._cursor() - 1))
+        self.listbox.bind('<Down>', lambda event: self._move_to(event, self._cursor() + 1))
+        self.listbox.bind('<Prior>', lambda event: self._move_to(event, self._cursor() - self.rows))
+        self.listbox.bind('<Next>', lambda event: self._move_to(event, self._cursor() + self.rows))
+        self.listbox.bind('<Home>', lambda event: self._move_to(event, 0))
+        self.listbox.bind('<End>', lambda event: self._move_to(event, len(self.model) - 1))
+        self.listbox.bind('<MouseWheel>', self._on_mousewheel)
+        self.listbox.bind('<Button-4>', lambda event: self.scroll_to(self.offset - 3))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll_to(self.offset + 3))
+
+    def refresh(self):
+        """
+        Redraws the visible rows and the scrollbar from the model.
+        """
+        total = len(self.model)
+        self.offset = max(min(self.offset, total - self.rows), 0)
+        self.selected = {index for index in self.selected if index < total}
+
+        self.listbox.delete(0, 'end')
+        visible = self.model.slice(self.offset, self.offset + self.rows)
+        for row, path in enumerate(visible):
+            self.listbox.insert('end', path)
+            if self.offset + row in self.selected:
+                self.listbox.selection_set(row)
+
+        if total:
+            self.scrollbar.set(self.offset / total, min((self.offset + self.rows) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        self.offset = int(offset)
+        self.refresh()
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(float(amount) * len(self.model))
+        elif action == 'scroll':
+            step = self.rows if unit == 'pages' else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.offset - int(event.delta / 120) * 3)
+        return "break"
+
+    def _on_click(self, event):
+        # Runs before the Listbox class binding updates the visible selection; the
+        # modifiers apply to every select event until the next click
+        self._extend = bool(event.state & (SHIFT_MASK | CONTROL_MASK))
+        if not self._extend:
+            self.anchor = self.offset + self.listbox.nearest(event.y)
+
+    def _on_select(self, event):
+        if self._extend:
+            # Rows on other pages stay selected; only the visible ones are re-read
+            visible = range(self.offset, self.offset + self.listbox.size())
+            self.selected.difference_update(visible)
+        else:
+            self.selected.clear()
+        self.selected.update(self.offset + row for row in self.listbox.curselection())
+        self.active = self.offset + self.listbox.index('active')
+
+    def _cursor(self):
+        return self.offset if self.active is None else self.active
+
+    def _move_to(self, event, target):
+        """
+        Moves the keyboard cursor to a model index, selecting it (or, with Shift, the
+        range from the anchor) and scrolling it into view.
+        """
+        total = len(self.model)
+        if not total:
+            return "break"
+        target = max(min(target, total - 1), 0)
+        if event.state & SHIFT_MASK and self.anchor is not None:
+            self.selected = set(range(min(self.anchor, target), max(self.anchor, target) + 1))
+        else:
+            self.selected = {target}
+            self.anchor = target
+        self.active = target
+        self._extend = False
+        if target < self.offset:
+            self.offset = target
+        elif target >= self.offset + self.rows:
+            self.offset = target - self.rows + 1
+        self.refresh()
+        self.listbox.activate(target - self.offset)
+        return "break"
+
+    def selected_indices(self):
+        """
+        Returns the selected model indices in ascending order.
+        """
+        return sorted(self.selected)
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.active = None
+        self.anchor = None
+        self.listbox.selection_clear(0, 'end')
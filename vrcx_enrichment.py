@@ -0,0 +1,112 @@
+# vrcx_enrichment.py
+import bisect
+import contextlib
+import datetime
+import logging
+import os
+import sqlite3
+
+# How far before the first photo to look for the location it was taken in
+LOCATION_LOOKBACK = 24 * 60 * 60
+
+
+def default_vrcx_database_path():
+    """
+    Returns the location of VRCX's local database in the user's AppData directory.
+    """
+    return os.path.join(os.getenv('APPDATA'), 'VRCX', 'VRCX.sqlite3')
+
+
+def _to_vrcx_time(timestamp):
+    # VRCX stores created_at as ISO 8601 UTC with milliseconds, so strings compare in time order
+    moment = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+
+def _from_vrcx_time(text):
+    return datetime.datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+
+
+class VRCXEnricher:
+    """
+    Fills in world and player information for photos taken without VRCX's
+    metadata embedding, from the game log VRCX keeps in its own database.
+
+    The database is opened read-only and each batch is resolved with one query per
+    game-log table, merging the location changes and join/leave events into a
+    single timeline that is replayed up to each photo's timestamp.
+    """
+    def __init__(self, database_path):
+        self.database_path = database_path
+
+    def available(self):
+        return os.path.isfile(self.database_path)
+
+    def lookup(self, timestamps):
+        """
+        Resolves {path: timestamp} to {path: metadata} for every photo taken inside a
+        known instance. Metadata uses the same JSON layout VRCX embeds in its photos.
+        """
+        photos = sorted(
+            ((timestamp, path) for path, timestamp in timestamps.items() if timestamp),
+            key=lambda photo: photo[0]
+        )
+        if not photos:
+            return {}
+
+        # urllib.request pulls in http.client and ssl, so it is only imported when needed
+        from urllib.request import pathname2url
+
+        start = _to_vrcx_time(photos[0][0] - LOCATION_LOOKBACK)
+        end = _to_vrcx_time(photos[-1][0])
+        uri = f"file:{pathname2url(self.database_path)}?mode=ro"
+        # Closed as soon as both queries are read, to hold VRCX's live database briefly
+        with contextlib.closing(sqlite3.connect(uri, uri=True)) as conn:
+            locations = conn.execute(
+                "SELECT created_at, location, world_id, world_name FROM gamelog_location "
+                "WHERE created_at BETWEEN ? AND ? ORDER BY created_at", (start, end)
+            ).fetchall()
+            events = conn.execute(
+                "SELECT created_at, type, display_name, user_id, location FROM gamelog_join_leave "
+                "WHERE created_at BETWEEN ? AND ? ORDER BY created_at",
+                (locations[0][0] if locations else end, end)
+            ).fetchall()
+
+        # Location changes sort before events logged at the same instant
+        timeline = sorted(
+            [(_from_vrcx_time(row[0]), 0, row[1:]) for row in locations]
+            + [(_from_vrcx_time(row[0]), 1, row[1:]) for row in events],
+            key=lambda entry: (entry[0], entry[1])
+        )
+        times = [entry[0] for entry in timeline]
+
+        results = {}
+        position = 0
+        location = None
+        players = {}
+        for timestamp, path in photos:
+            stop = bisect.bisect_right(times, timestamp)
+            for _, kind, row in timeline[position:stop]:
+                if kind == 0:
+                    location = row
+                    players = {}
+                elif location and row[3] == location[0]:
+                    event_type, display_name, user_id = row[0], row[1], row[2]
+                    if event_type == 'OnPlayerJoined':
+                        players[display_name] = user_id
+                    elif event_type == 'OnPlayerLeft':
+                        players.pop(display_name, None)
+            position = stop
+
+            if location and location[1]:
+                instance, world_id, world_name = location
+                results[path] = {
+                    "application": "VRCX",
+                    "version": 1,
+                    "world": {"name": world_name, "id": world_id, "instanceId": instance},
+                    "players": [
+                        {"displayName": name, "id": user_id or ""} for name, user_id in players.items()
+                    ],
+                }
+        logging.info(f"Enriched {len(results)} of {len(timestamps)} photos from the VRCX game log")
+        return results